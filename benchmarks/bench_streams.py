@@ -0,0 +1,27 @@
+# Run from the repository root: python -m benchmarks.bench_streams
+import random
+import timeit
+
+import numpy as np
+
+from festival.streams import RandomStreams
+
+N = 200000
+
+streams = RandomStreams(0)
+p = [0.04, 0.16, 0.16, 0.64]
+
+# The draw sites served from numpy blocks: (draw site, per-draw call it replaces, stream call).
+# The scalar draws use a seeded random.Random, which costs the same as the random module.
+cases = [
+    ("wander heading",
+     "a = random.random() * 2 * np.pi; np.array([np.cos(a), np.sin(a)])",
+     "np.array(streams.direction())"),
+    ("pareto fight outcome", "np.random.choice(np.arange(0, 4), p=p)", "streams.weighted_index(p)"),
+]
+
+print("%-32s %12s %12s %8s" % ("draw", "before [us]", "after [us]", "speedup"))
+for name, before, after in cases:
+    t_before = timeit.timeit(before, globals=globals(), number=N) / N * 1e6
+    t_after = timeit.timeit(after, globals=globals(), number=N) / N * 1e6
+    print("%-32s %12.3f %12.3f %7.1fx" % (name, t_before, t_after, t_before / t_after))
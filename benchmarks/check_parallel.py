@@ -0,0 +1,36 @@
+# Run from the repository root: python -m benchmarks.check_parallel
+# Checks that a seeded festival ends in the same state with and without the parallel executor.
+import contextlib
+import io
+
+from festival.festival import FestivalModel
+
+cases = [
+    # (model parameters, steps)
+    ({}, 300),
+    # Fights push enjoyment back over 0.5 while a stage target is kept, so guests wander with a target
+    ({"num_trouble": 30, "pareto_fight": True, "pareto": True}, 1500),
+]
+
+
+def final_state(params, steps, workers):
+    with FestivalModel(workers=workers, **params) as model, contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(steps):
+            model.step()
+        return {a.unique_id: (tuple(a.pos), a.fullness, a.enjoyment, a.happiness,
+                              a.target.unique_id if a.target is not None else None)
+                for a in filter(lambda x: x.type == 'guest', model.schedule.agents)}
+
+
+failed = False
+for params, steps in cases:
+    for seed in (0, 1, 2):
+        serial = final_state(dict(params, seed=seed), steps, 0)
+        for workers in (1, 4):
+            parallel = final_state(dict(params, seed=seed), steps, workers)
+            different = [key for key in serial if serial[key] != parallel.get(key)]
+            print("%s seed=%d workers=%d: %d guests differ" % (params, seed, workers, len(different)))
+            failed = failed or len(different) > 0
+
+if failed:
+    raise SystemExit("Serial and parallel runs differ")
@@ -0,0 +1,65 @@
+from mesa.visualization.modules import ChartModule
+
+from festival.SimpleContinuousModule import SimpleCanvas
+
+
+guest_color_dict = {
+    # role, color
+    'party': 'Orange',
+    'troublemaker': 'Red',
+    'celebrity': 'Pink',
+    'guard': 'Black',
+    'hippie': 'Green',
+    'lucia': 'Yellow'
+}
+
+guest_size_dict = {
+    # role, color
+    'party': 4,
+    'troublemaker': 4,
+    'celebrity': 6,
+    'guard': 4,
+    'hippie': 4,
+    'lucia': 15
+}
+
+
+def agent_draw(agent):
+    if agent.role == 'store':
+        display = {"Shape": "rect",
+                   "w": 0.05,
+                   "h": 0.05,
+                   "Filled": "true",
+                   "Color": "Blue"}
+    elif agent.role == 'stage':
+        display = {"Shape": "rect",
+                   "w": 0.05,
+                   "h": 0.05,
+                   "Filled": "true",
+                   "Color": "Red"}
+    # elif agent.role == 'Lucia':
+    #     display = {"Shape": "star",
+    #                "r": 6,
+    #                "Filled": "true",
+    #                "Color": "Yellow"}
+    else:
+        display = {"Shape": "circle",
+                   "r": guest_size_dict[agent.role],
+                   "Filled": "True",
+                   "Color": guest_color_dict[agent.role]}
+    return display
+
+
+canvas = SimpleCanvas(agent_draw, 500, 500)
+
+# chart = ChartModule([{"Label": "Alive agents",
+#                       "Color": "Black"}],
+#                     data_collector_name='datacollector')
+
+chart = ChartModule([{"Label": "Mean happiness",
+                      "Color": "Red"}],
+                    data_collector_name='datacollector')
+
+# chart = ChartModule([{"Label": "Mean fullness",
+#                       "Color": "Red"}],
+#                     data_collector_name='datacollector')
@@ -1,4 +1,3 @@
-import random
 from typing import Type, Any, Tuple, List
 
 import numpy as np
@@ -13,6 +12,9 @@ from mesa.space import ContinuousSpace
 
 from tqdm import tqdm
 
+from .streams import RandomStreams
+from .knowledge import KnowledgeCache
+from .parallel import ParallelStageExecutor, ParallelStagedActivation
 from .guests import Guest, PartyPerson, Guard, Troublemaker, Celebrity, Hippie, Lucia
 
 import seaborn as sns
@@ -69,8 +71,10 @@ class Event(Agent):
 class FestivalModel(Model):
 
     def __init__(self, num_party: int= 20, num_guard: int= 5, num_trouble: int= 5, num_celeb: int= 5, num_hippie: int= 20,
-                 learning=True, pareto_fight=False, pareto=False, lucia=False):
+                 learning=True, pareto_fight=False, pareto=False, lucia=False, seed=None,
+                 knowledge_cache: KnowledgeCache = None, workers: int = 0):
         super().__init__()
+        self.streams = RandomStreams(seed)
         self.num_agents = num_party + num_guard + num_trouble + num_celeb + num_hippie
         self.num_party = num_party
         self.num_guard = num_guard
@@ -80,9 +84,16 @@ class FestivalModel(Model):
         self.pareto = pareto
         self.pareto_fight = pareto_fight
         self.lucia = lucia
+        self.knowledge_cache = knowledge_cache
 
-        self.schedule = StagedActivation(self, ['send_proposes', 'process_proposes', 'step', 'die'])
         self.space = ContinuousSpace(100, 100, False)
+        if workers > 0:
+            self.executor = ParallelStageExecutor(self, workers)
+            self.schedule = ParallelStagedActivation(self, ['send_proposes', 'process_proposes', 'step', 'die'],
+                                                     self.executor)
+        else:
+            self.executor = None
+            self.schedule = StagedActivation(self, ['send_proposes', 'process_proposes', 'step', 'die'])
         self.datacollector = DataCollector(
             model_reporters={"Alive agents": lambda model: model.schedule.get_agent_count(),
                              "Mean happiness": lambda model: np.mean([a.happiness for a in filter(lambda x: x.type == 'guest', model.schedule.agents)]),
@@ -90,31 +101,31 @@ class FestivalModel(Model):
         )
 
         for i in range(self.num_party):
-            x, y = np.random.rand(2) * 100
+            x, y = np.array(self.streams.rand(2)) * 100
             a_ = PartyPerson('Party%d' % i, self, (x, y), learning)
             self.schedule.add(a_)
             self.space.place_agent(a_, (x, y))
 
         for i in range(self.num_guard):
-            x, y = np.random.rand(2) * 100
+            x, y = np.array(self.streams.rand(2)) * 100
             a_ = Guard('Guard%d' % i, self, (x, y), learning)
             self.schedule.add(a_)
             self.space.place_agent(a_, (x, y))
 
         for i in range(self.num_trouble):
-            x, y = np.random.rand(2) * 100
+            x, y = np.array(self.streams.rand(2)) * 100
             a_ = Troublemaker('Trouble%d' % i, self, (x, y), learning)
             self.schedule.add(a_)
             self.space.place_agent(a_, (x, y))
 
         for i in range(self.num_celeb):
-            x, y = np.random.rand(2) * 100
+            x, y = np.array(self.streams.rand(2)) * 100
             a_ = Celebrity('Celeb%d' % i, self, (x, y), learning)
             self.schedule.add(a_)
             self.space.place_agent(a_, (x, y))
 
         for i in range(self.num_hippie):
-            x, y = np.random.rand(2) * 100
+            x, y = np.array(self.streams.rand(2)) * 100
             a_ = Hippie('Hippie%d' % i, self, (x, y), learning)
             self.schedule.add(a_)
             self.space.place_agent(a_, (x, y))
@@ -135,10 +146,26 @@ class FestivalModel(Model):
             self.schedule.add(a_)
             self.space.place_agent(a_, (x, y))
 
+        if knowledge_cache is not None:
+            knowledge_cache.warm_start(self)
+
     def step(self):
         self.datacollector.collect(self)
         self.schedule.step()
 
+    def close(self):
+        """
+        Stops the worker processes of the parallel executor, if any
+        """
+        if self.executor is not None:
+            self.executor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def fight(self, agent1: Guest, agent2: Guest):
         assert self == agent1.model == agent2.model, "Can't fight between other festival's guests"
         buffers = {agent1: 0., agent2: 0.}
@@ -152,14 +179,14 @@ class FestivalModel(Model):
             if self.pareto_fight:
                 p1 = [0.25, 0.25, 0.25, 0.25]
                 p2 = [0.04, 0.16, 0.16, 0.64]
-                index = np.random.choice(np.arange(0, 4), p=p1 if self.pareto else p2)
+                index = self.streams.weighted_index(p1 if self.pareto else p2)
                 store = [(0, 0), (0.2, -0.7), (-0.7, 0.2), (-0.5, -0.5)]
 
                 select = store[index]
                 buffers_joy[agent] += select[0] if agent.role == 'troublemaker' else select[1]
 
             buffers[agent] += agent.tastes['fight']
-            buffers[agent] += 0.5*random.random() - 0.25
+            buffers[agent] += 0.5*self.streams.random() - 0.25
 
         for agent in (agent1, agent2):
             agent.happiness += buffers[agent]
@@ -179,7 +206,7 @@ class FestivalModel(Model):
             if agent.role == 'guard':
                 buffers[agent] -= 3
             buffers[agent] += agent.tastes['party']
-            buffers[agent] += 0.5*random.random() - 0.25
+            buffers[agent] += 0.5*self.streams.random() - 0.25
 
         for agent in (agent1, agent2):
             agent.happiness += buffers[agent]
@@ -246,7 +273,7 @@ class FestivalModel(Model):
 
         for agent in (celeb, guest):
             buffers[agent] += agent.tastes['selfie']
-            buffers[agent] += 0.5*random.random() - 0.25
+            buffers[agent] += 0.5*self.streams.random() - 0.25
 
         for agent in (agent1, agent2):
             agent.happiness += buffers[agent]
@@ -285,7 +312,7 @@ class FestivalModel(Model):
 
         for agent in (hippie, guest):
             buffers[agent] += agent.tastes['smoke']
-            buffers[agent] += 0.5*random.random() - 0.25
+            buffers[agent] += 0.5*self.streams.random() - 0.25
 
         for agent in (agent1, agent2):
             agent.happiness += buffers[agent]
@@ -314,7 +341,7 @@ class FestivalModel(Model):
 
         for agent in (lucia, guest):
             buffers[agent] += agent.tastes['blessing']
-            buffers[agent] += 0.5*random.random() - 0.25
+            buffers[agent] += 0.5*self.streams.random() - 0.25
 
         for agent in (agent1, agent2):
             agent.happiness += buffers[agent]
@@ -1,5 +1,7 @@
-import random
-from typing import Type, Any, Tuple, List, DefaultDict
+import math
+from bisect import bisect
+from itertools import accumulate
+from typing import Type, Any, Tuple, List, DefaultDict, Sequence
 from collections import defaultdict
 
 import numpy as np
@@ -19,6 +21,31 @@ import seaborn as sns
 sns.set()
 
 
+def step_towards(pos: np.ndarray, heading: np.ndarray, speed: float) -> np.ndarray:
+    """
+    Position after moving along the heading with the specified speed.
+    """
+    return pos + speed * heading / np.linalg.norm(heading)
+
+
+def step_random(pos: np.ndarray, direction: Sequence[float], speed: float) -> np.ndarray:
+    """
+    Position after moving with the specified speed along direction, a random unit vector.
+    """
+    rand_vector = speed * np.array(direction)
+    target_location = pos + rand_vector
+    return np.clip(target_location, [0, 0], [99.9, 99.9])
+
+
+def softmax_index(know: Sequence[float], u: float) -> int:
+    """
+    Index drawn with probability softmax(know), using u, a uniform draw in [0, 1).
+    Plain python, the lists are only a few neighbors long.
+    """
+    cum_probs = list(accumulate(map(math.exp, know)))
+    return min(bisect(cum_probs, u * cum_probs[-1]), len(cum_probs) - 1)
+
+
 class Guest(Agent):
 
     def __init__(self, unique_id: Any, model: Model, pos: Tuple[float, float], learning: bool = True):
@@ -37,17 +64,19 @@ class Guest(Agent):
         self.role: str = None
         self.type = 'guest'
         self.tastes = {
-            'party': random.random() - 0.5,
-            'fight': random.random() - 0.5,
-            'selfie': random.random() - 0.5,
-            'smoke': random.random() - 0.5,
-            'blessing': random.random() - 0.5,
+            'party': model.streams.random() - 0.5,
+            'fight': model.streams.random() - 0.5,
+            'selfie': model.streams.random() - 0.5,
+            'smoke': model.streams.random() - 0.5,
+            'blessing': model.streams.random() - 0.5,
         }
 
         self.target = None
 
         self.knowledge: DefaultDict[Tuple[str, str], float] = defaultdict(float)
         self.knowledge_steps: DefaultDict[Tuple[str, str], int] = defaultdict(lambda: 1)
+        # Starting (value, steps) of every key, anything learned since is knowledge_steps - steps observations
+        self.knowledge_prior: DefaultDict[Tuple[str, str], Tuple[float, int]] = defaultdict(lambda: (0., 1))
 
         self.action: str = None
 
@@ -67,8 +96,7 @@ class Guest(Agent):
         target = np.array(target)
 
         heading = np.array(self.model.space.get_heading(pos, target))
-        vector = speed * heading / np.linalg.norm(heading)
-        self.model.space.move_agent(self, pos + vector)
+        self.model.space.move_agent(self, step_towards(pos, heading, speed))
         return
 
     def wander(self, speed: float = 1.):
@@ -76,12 +104,7 @@ class Guest(Agent):
         Moves in a random direction with a specified speed
         """
         pos = np.array(self.pos)
-
-        random_heading = random.random() * 2 * np.pi
-        rand_vector = speed * np.array([np.cos(random_heading), np.sin(random_heading)])
-        target_location = pos + rand_vector
-        target_location = np.clip(target_location, [0, 0], [99.9, 99.9])
-        self.model.space.move_agent(self, target_location)
+        self.model.space.move_agent(self, step_random(pos, self.model.streams.direction(), speed))
         return
 
     def propose_interaction(self, other: 'Guest', action: str):
@@ -100,21 +123,25 @@ class Guest(Agent):
         Sends a proposal of an interaction to a neighbor
 
         """
+        # Drawn even without neighbors, so that every guest takes exactly one draw in this stage
+        u = self.model.streams.random()
         neighbors = self.model.space.get_neighbors(self.pos, self.range, include_center=False)
         neighbors = list(filter(lambda x: x.type == 'guest', neighbors))
+        self.propose_to(neighbors, u)
 
+    def propose_to(self, neighbors: List['Guest'], u: float):
+        """
+        Picks one of the neighboring guests, weighted by the softmax of the knowledge, and proposes to it
+        Args:
+            neighbors: guests in range, in the order of the space
+            u: uniform draw in [0, 1) used for the choice
+        """
         if len(neighbors) > 0:
             options = list(map(lambda x: (x.role, self.action), neighbors))
             know = list(map(lambda x: self.knowledge[x], options))
-            # print("Knowledges", probs)
-            probs = list(map(lambda x: np.exp(x), know))
-            # print("Softmax", probs)
-            probs = list(map(lambda x: x / sum(probs), probs))
-            # print("Normed", probs)
-            if len(neighbors) > 1:
-                print(self.unique_id, neighbors, probs, know)
-
-            other_agent = random.choices(neighbors, probs)[0]
+            # print(self.unique_id, neighbors, know)
+
+            other_agent = neighbors[softmax_index(know, u)]
             self.propose_interaction(other_agent, self.action)
 
     def process_proposes(self):
@@ -127,7 +154,7 @@ class Guest(Agent):
         for proposal in self.interaction_proposals:
             proposal: Tuple[Guest, str]
             error_prob = .05
-            if random.random() < error_prob:
+            if self.model.streams.random() < error_prob:
                 accepted[proposal] = True
             else:
                 if self.knowledge[(proposal[0].role, proposal[1])] >= 0:
@@ -151,14 +178,25 @@ class Guest(Agent):
 
             other: Guest
             interaction: str
-            other, interaction = random.choice(self.interaction_proposals)
+            other, interaction = self.model.streams.choice(self.interaction_proposals)
             # print(interaction)
 
             getattr(self.model, interaction)(self, other)
             other.interaction_proposals = []
 
     def step(self):
+        target = self.plan_step()
+        if target is None:
+            self.wander(1.0)
+        else:
+            self.head_to(target, speed=1.)
+        self.finish_step()
 
+    def plan_step(self):
+        """
+        Updates the needs and picks a target if needed.
+        Returns the position to head to, or None to wander.
+        """
         self.fullness -= 0.005 * self.fullness
         self.enjoyment -= 0.0005 * self.enjoyment
         # self.happiness += 0.1 * (self.fullness - 0.5) + 0.1 * (self.enjoyment - 0.5)
@@ -167,25 +205,31 @@ class Guest(Agent):
 
         if self.fullness < 0.5:
             if self.target is None:
-                self.target = random.choice(list(filter(lambda x: x.type == 'store', self.model.schedule.agents)))
-            self.head_to(self.target.pos, speed=1.)
+                self.target = self.model.streams.choice(list(filter(lambda x: x.type == 'store', self.model.schedule.agents)))
+            return self.target.pos
         elif self.enjoyment < 0.5:
             if self.target is None:
-                self.target = random.choice(list(filter(lambda x: x.type == 'stage', self.model.schedule.agents)))
-            self.head_to(self.target.pos, speed=1.)
-        else:
-            self.wander(1.0)
+                self.target = self.model.streams.choice(list(filter(lambda x: x.type == 'stage', self.model.schedule.agents)))
+            return self.target.pos
+        return None
 
+    def finish_step(self):
+        """
+        Consumes the target once reached, and clears the proposals of this step
+        """
         if self.target is not None and self.distance_to(self.target.pos) < 2:
-            if self.target.type == 'store':
-                self.fullness = 1.
-            elif self.target.type == 'stage':
-                self.enjoyment = 1.
-            self.target = None
+            self.reach_target()
 
         self.interaction_proposals = []
         # print(self, self.knowledge)
 
+    def reach_target(self):
+        if self.target.type == 'store':
+            self.fullness = 1.
+        elif self.target.type == 'stage':
+            self.enjoyment = 1.
+        self.target = None
+
     def die(self):
         if self.dead:
             self.model.space.remove_agent(self)
@@ -0,0 +1,137 @@
+import fcntl
+import json
+import os
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from mesa import Model
+
+
+class KnowledgeCache:
+    """
+    On-disk store of what the guests of a festival learned, used to warm-start new festivals.
+
+    Knowledge is aggregated per role: for every (other role, action) key the cache keeps
+    the mean learned payoff and the number of real observations behind it, and every save
+    adds the observations of a run to them. There is one file per configuration
+    (role counts, pareto_fight, pareto, lucia), since payoffs depend on it.
+    """
+
+    def __init__(self, path: str = 'knowledge_cache', max_prior_steps: int = 20):
+        """
+        Args:
+            path: directory holding the cache files
+            max_prior_steps: cap on how many observations a cached value counts as
+                when seeding a guest (at least 1), so that the guest can still adapt
+        """
+        assert max_prior_steps >= 1, "A cached value counts as at least one observation"
+        self.path = path
+        self.max_prior_steps = max_prior_steps
+
+    @staticmethod
+    def config(model: Model) -> Dict:
+        return {'num_party': model.num_party,
+                'num_guard': model.num_guard,
+                'num_trouble': model.num_trouble,
+                'num_celeb': model.num_celeb,
+                'num_hippie': model.num_hippie,
+                'pareto_fight': bool(model.pareto_fight),
+                'pareto': bool(model.pareto),
+                'lucia': bool(model.lucia)}
+
+    def file_for(self, model: Model) -> str:
+        config = self.config(model)
+        name = '-'.join('%s%d' % (key, int(value)) for key, value in sorted(config.items()))
+        return os.path.join(self.path, name + '.json')
+
+    @staticmethod
+    def aggregate(model: Model) -> Dict[str, List[Tuple[str, str, float, int]]]:
+        """
+        Per role table of (other role, action, mean payoff, observations) for the guests of the model.
+        Only what the guests learned during the run counts: the starting estimate of a key
+        (the initial 0, or the value seeded by warm_start) is taken out using knowledge_prior.
+        """
+        sums = defaultdict(float)
+        counts = defaultdict(int)
+        for agent in filter(lambda x: x.type == 'guest', model.schedule.agents):
+            for key, steps in agent.knowledge_steps.items():
+                prior_value, prior_steps = agent.knowledge_prior[key]
+                observations = steps - prior_steps
+                if observations <= 0:
+                    continue
+                # The incremental mean over steps values, minus the prior_steps copies of the prior
+                sums[(agent.role,) + key] += steps * agent.knowledge[key] - prior_steps * prior_value
+                counts[(agent.role,) + key] += observations
+
+        tables = defaultdict(list)
+        for (role, other, action), count in sorted(counts.items()):
+            tables[role].append((other, action, sums[(role, other, action)] / count, count))
+        return dict(tables)
+
+    @staticmethod
+    def merge(old: Dict[str, List[Tuple[str, str, float, int]]],
+              new: Dict[str, List[Tuple[str, str, float, int]]]) -> Dict[str, List[Tuple[str, str, float, int]]]:
+        """
+        Combines two per role tables, weighting the means by their observations
+        """
+        sums = defaultdict(float)
+        counts = defaultdict(int)
+        for tables in (old, new):
+            for role, table in tables.items():
+                for other, action, value, observations in table:
+                    sums[(role, other, action)] += value * observations
+                    counts[(role, other, action)] += observations
+
+        merged = defaultdict(list)
+        for (role, other, action), count in sorted(counts.items()):
+            merged[role].append((other, action, sums[(role, other, action)] / count, count))
+        return dict(merged)
+
+    def save(self, model: Model):
+        """
+        Adds what the model's guests learned to the entry for its configuration.
+        The guests' knowledge_prior is moved to their current knowledge, so that saving
+        the same model again only adds what was learned in between.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        path = self.file_for(model)
+        tmp_path = path + '.tmp'
+        # Runs of a sweep can save the same configuration at once, the lock keeps
+        # the read-merge-write atomic so that no run's observations are lost
+        with open(path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            tables = self.merge(self.load(model), self.aggregate(model))
+            with open(tmp_path, 'w') as f:
+                json.dump({'config': self.config(model), 'roles': tables}, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+        for agent in filter(lambda x: x.type == 'guest', model.schedule.agents):
+            for key, steps in agent.knowledge_steps.items():
+                agent.knowledge_prior[key] = (agent.knowledge[key], steps)
+
+    def load(self, model: Model) -> Dict[str, List[Tuple[str, str, float, int]]]:
+        path = self.file_for(model)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)['roles']
+
+    def warm_start(self, model: Model) -> int:
+        """
+        Seeds the knowledge of every learning guest from the cached table of its role.
+        Returns the number of guests that were seeded.
+        """
+        tables = self.load(model)
+        seeded = 0
+        for agent in filter(lambda x: x.type == 'guest', model.schedule.agents):
+            if not agent.learning or agent.role not in tables:
+                continue
+            for other, action, value, observations in tables[agent.role]:
+                # knowledge_steps counts the starting estimate, here the cached value itself
+                prior_steps = min(observations, self.max_prior_steps)
+                agent.knowledge[(other, action)] = value
+                agent.knowledge_steps[(other, action)] = prior_steps
+                agent.knowledge_prior[(other, action)] = (value, prior_steps)
+            seeded += 1
+        return seeded
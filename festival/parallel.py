@@ -0,0 +1,243 @@
+import os
+import weakref
+from multiprocessing import Pool, RawArray
+from typing import List, Tuple
+
+import numpy as np
+
+from mesa import Model
+from mesa.space import ContinuousSpace
+from mesa.time import StagedActivation
+
+from .guests import Guest, softmax_index, step_towards, step_random
+
+
+ROLES = ('party', 'guard', 'troublemaker', 'celebrity', 'hippie', 'lucia')
+ROLE_INDEX = {role: i for i, role in enumerate(ROLES)}
+
+# Views on the shared arrays, set in every worker by _init_worker (and inherited through fork)
+_shared = {}
+
+
+def _init_worker(arrays):
+    for name, (raw, shape) in arrays.items():
+        _shared[name] = np.frombuffer(raw, dtype=np.float64).reshape(shape)
+
+
+def _proposals_task(args: Tuple[int, int, int]):
+    """
+    Picks the partner of the guests order[start:end], a strip of the space along x,
+    and writes its index (-1 without neighbors) to their rows of the shared choice array.
+    Only the guests whose x is within reach of the strip are looked at.
+    """
+    start, end, n = args
+    pos = _shared['pos'][:n]
+    ranges = _shared['range'][:n]
+    order = _shared['order'][:n].astype(np.int64)
+    space_index = _shared['space_index'][:n]
+    role = _shared['role'][:n].astype(np.int64)
+    know = _shared['know']
+    u = _shared['u']
+    choice = _shared['choice']
+    sorted_x = pos[order, 0]
+
+    reach = ranges.max()
+    lo = np.searchsorted(sorted_x, sorted_x[start] - reach, side='left')
+    hi = np.searchsorted(sorted_x, sorted_x[end - 1] + reach, side='right')
+    # Neighbors in the order of the space, as ContinuousSpace.get_neighbors returns them
+    candidates = order[lo:hi]
+    candidates = candidates[np.argsort(space_index[candidates], kind='mergesort')]
+    candidate_pos = pos[candidates]
+
+    for i in order[start:end]:
+        # Same arithmetic as ContinuousSpace.get_neighbors, so that the boundary cases agree
+        deltas = np.abs(candidate_pos - pos[i])
+        dists = deltas[:, 0] ** 2 + deltas[:, 1] ** 2
+        found = candidates[(dists <= ranges[i] ** 2) & (dists > 0)]
+        if len(found) > 0:
+            choice[i] = found[softmax_index(know[i, role[found]].tolist(), u[i])]
+        else:
+            choice[i] = -1
+
+
+def _move_task(args: Tuple[int, int, int]):
+    """
+    New positions of the guests order[start:end], and whether they reached their target,
+    written to their own rows of the shared new_pos and arrived arrays.
+    As in Guest.finish_step, a guest that wanders while it still has a target can reach it too.
+    """
+    start, end, n = args
+    pos = _shared['pos']
+    target = _shared['target']
+    has_target = _shared['has_target']
+    wander = _shared['wander']
+    new_pos = _shared['new_pos']
+    arrived = _shared['arrived']
+    order = _shared['order'][:n].astype(np.int64)
+
+    for i in order[start:end]:
+        if wander[i, 2] > 0:
+            new_pos[i] = step_random(pos[i].copy(), wander[i, :2], 1.0)
+        else:
+            new_pos[i] = step_towards(pos[i].copy(), target[i] - pos[i], 1.)
+        arrived[i] = has_target[i] > 0 and np.linalg.norm(new_pos[i] - target[i]) < 2
+
+
+class ParallelStageExecutor:
+    """
+    Runs the send_proposes and step stages of the guests on a pool of worker processes.
+
+    The guests are split into strips along x, one task per strip. Positions, knowledge and the
+    random draws are put in shared memory; the workers do the neighbor search, the softmax choice
+    of the partner, the movement and the arrival check. The main process then applies the results
+    in schedule order: the proposals, one bulk write of the positions to the space, and the targets
+    reached. Random draws are taken in the main process in the same order as the serial stages,
+    so a seeded run gives the same festival with or without the executor.
+
+    This does not give near-linear scaling. The Python agent objects cannot live in shared memory,
+    so filling the inputs, plan_step, the proposal bookkeeping and the whole process_proposes stage
+    still run once per guest in the main process, and every step costs two round trips to the pool.
+
+    Subclass overrides of Guest.send_proposes and Guest.step are bypassed, the executor
+    uses Guest.propose_interaction, Guest.plan_step and Guest.reach_target directly.
+    """
+
+    stages = ('send_proposes', 'step')
+
+    def __init__(self, model: Model, workers: int = None, partitions: int = None):
+        # The executor reads and writes the internals of the mesa 0.8.5 ContinuousSpace
+        assert type(model.space) is ContinuousSpace, "The parallel executor only supports a ContinuousSpace"
+        assert hasattr(model.space, '_agent_points') and hasattr(model.space, '_agent_to_index'), \
+            "The parallel executor needs the ContinuousSpace internals of mesa 0.8.5"
+        assert not model.space.torus, "The parallel executor only supports a bounded space"
+        self.model = model
+        self.workers = workers or os.cpu_count()
+        self.partitions = partitions or self.workers
+        self.capacity = model.num_agents + 1  # + Lucia
+
+        shapes = {'pos': (self.capacity, 2),
+                  'range': (self.capacity,),
+                  'order': (self.capacity,),
+                  'space_index': (self.capacity,),
+                  'role': (self.capacity,),
+                  'know': (self.capacity, len(ROLES)),  # knowledge[(role, own action)]
+                  'u': (self.capacity,),
+                  'choice': (self.capacity,),
+                  'target': (self.capacity, 2),  # position of guest.target
+                  'has_target': (self.capacity,),
+                  'wander': (self.capacity, 3),  # direction, 1 if wandering
+                  'new_pos': (self.capacity, 2),
+                  'arrived': (self.capacity,)}
+        arrays = {name: (RawArray('d', int(np.prod(shape))), shape) for name, shape in shapes.items()}
+        self.shared = {name: np.frombuffer(raw, dtype=np.float64).reshape(shape)
+                       for name, (raw, shape) in arrays.items()}
+        self.pool = Pool(self.workers, initializer=_init_worker, initargs=(arrays,))
+        # Safety net for models that are dropped without close(), the model and executor form a cycle
+        self.finalizer = weakref.finalize(self, self.pool.terminate)
+
+    def load(self, guests: List[Guest]) -> Tuple[List[Tuple[int, int, int]], List[int]]:
+        """
+        Copies the positions from the space, sorts the guests along x and splits them into strips.
+        Returns the tasks and the index of every guest in the space.
+        """
+        n = len(guests)
+        space = self.model.space
+        space_index = [space._agent_to_index[guest] for guest in guests]
+        pos = self.shared['pos']
+        pos[:n] = space._agent_points[space_index]
+        self.shared['space_index'][:n] = space_index
+        self.shared['order'][:n] = np.argsort(pos[:n, 0], kind='mergesort')
+
+        bounds = np.linspace(0, n, min(self.partitions, n) + 1).astype(int)
+        tasks = [(int(start), int(end), n) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+        return tasks, space_index
+
+    def send_proposes(self, guests: List[Guest]):
+        n = len(guests)
+        if n == 0:
+            return
+        know = self.shared['know']
+        for i, guest in enumerate(guests):
+            know[i] = [guest.knowledge.get((role, guest.action), 0.) for role in ROLES]
+        self.shared['range'][:n] = [guest.range for guest in guests]
+        self.shared['role'][:n] = [ROLE_INDEX[guest.role] for guest in guests]
+        # One draw per guest in schedule order, as the serial send_proposes does
+        self.shared['u'][:n] = [self.model.streams.random() for _ in range(n)]
+        tasks, _ = self.load(guests)
+
+        self.pool.map(_proposals_task, tasks)
+
+        choice = self.shared['choice'][:n].astype(np.int64).tolist()
+        for guest, j in zip(guests, choice):
+            if j >= 0:
+                guest.propose_interaction(guests[j], guest.action)
+
+    def step(self, guests: List[Guest]):
+        n = len(guests)
+        if n == 0:
+            return
+        target = self.shared['target']
+        has_target = self.shared['has_target']
+        wander = self.shared['wander']
+        for i, guest in enumerate(guests):
+            if guest.plan_step() is None:
+                wander[i, :2] = self.model.streams.direction()
+                wander[i, 2] = 1.
+            else:
+                wander[i] = (0., 0., 0.)
+            # Set apart from wandering: the target can outlive the need that chose it
+            if guest.target is not None:
+                target[i] = guest.target.pos
+                has_target[i] = 1.
+            else:
+                has_target[i] = 0.
+        tasks, space_index = self.load(guests)
+
+        self.pool.map(_move_task, tasks)
+
+        new_pos = self.shared['new_pos'][:n].copy()
+        # Bulk move instead of move_agent: this skips its out of bounds check on purpose,
+        # step_random clips to the space and step_towards heads to a store or stage inside it
+        self.model.space._agent_points[space_index] = new_pos
+        arrived = self.shared['arrived'][:n].tolist()
+        for i, guest in enumerate(guests):
+            guest.pos = new_pos[i]
+            if arrived[i]:
+                guest.reach_target()
+            guest.interaction_proposals = []
+
+    def close(self):
+        if self.finalizer.detach() is not None:
+            self.pool.close()
+            self.pool.join()
+
+
+class ParallelStagedActivation(StagedActivation):
+    """
+    StagedActivation that hands the guests' part of the parallel stages to a ParallelStageExecutor.
+    The other agents (stores and stages) still run every stage serially, before the guests.
+    """
+
+    def __init__(self, model: Model, stage_list: List[str], executor: ParallelStageExecutor,
+                 shuffle: bool = False, shuffle_between_stages: bool = False):
+        super().__init__(model, stage_list, shuffle, shuffle_between_stages)
+        self.executor = executor
+
+    def step(self):
+        agent_keys = list(self._agents.keys())
+        if self.shuffle:
+            self.model.random.shuffle(agent_keys)
+        for stage in self.stage_list:
+            agents = [self._agents[agent_key] for agent_key in agent_keys]
+            if stage in self.executor.stages:
+                for agent in filter(lambda x: x.type != 'guest', agents):
+                    getattr(agent, stage)()
+                getattr(self.executor, stage)(list(filter(lambda x: x.type == 'guest', agents)))
+            else:
+                for agent in agents:
+                    getattr(agent, stage)()
+            if self.shuffle_between_stages:
+                self.model.random.shuffle(agent_keys)
+            self.time += self.stage_time
+
+        self.steps += 1
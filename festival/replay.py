@@ -0,0 +1,204 @@
+import json
+import struct
+import zlib
+from typing import Any, List, Dict
+
+from mesa import Model
+from mesa.visualization.ModularVisualization import ModularServer, VisualizationElement
+from mesa.visualization.UserParam import UserSettableParameter
+
+from tqdm import tqdm
+
+
+MAGIC = b'FESTREC1'
+FOOTER = struct.Struct('<Q')
+
+
+def _compact(value: Any, precision: int):
+    """
+    Rounds every float of a rendered frame, so that the compressor sees repeated digits
+    instead of noise. 4 digits is well below a pixel on a 500x500 canvas.
+    """
+    if isinstance(value, float):
+        return round(float(value), precision)
+    if isinstance(value, dict):
+        return {k: _compact(v, precision) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_compact(v, precision) for v in value]
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return _compact(value.item(), precision)
+    return value
+
+
+class FrameWriter:
+    """
+    Writes rendered frames (one list entry per visualization element) to a recording file.
+
+    Frames are grouped in chunks of `chunk_size`, each chunk compressed on its own,
+    and an index of the chunk offsets is written at the end of the file so any frame
+    can be read without decompressing the whole recording.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 64, precision: int = 4, meta: Dict = None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.precision = precision
+        self.meta = meta or {}
+
+        self.num_frames = 0
+        self.offsets: List[int] = []
+        self.chunk: List[Any] = []
+
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+
+    def write(self, frame: List[Any]):
+        if self.precision is not None:
+            frame = _compact(frame, self.precision)
+        self.chunk.append(frame)
+        self.num_frames += 1
+        if len(self.chunk) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.chunk) == 0:
+            return
+        self.offsets.append(self.file.tell())
+        self.file.write(zlib.compress(json.dumps(self.chunk, separators=(',', ':')).encode(), 9))
+        self.chunk = []
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        index_offset = self.file.tell()
+        index = {'chunk_size': self.chunk_size,
+                 'num_frames': self.num_frames,
+                 'offsets': self.offsets + [index_offset],
+                 'meta': self.meta}
+        self.file.write(zlib.compress(json.dumps(index).encode(), 9))
+        self.file.write(FOOTER.pack(index_offset))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FrameReader:
+    """
+    Random access to the frames of a recording made by FrameWriter.
+    The last decompressed chunk is kept, so playing forward only inflates every chunk once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'rb')
+        assert self.file.read(len(MAGIC)) == MAGIC, "%s is not a festival recording" % path
+
+        self.file.seek(-FOOTER.size, 2)
+        footer_offset = self.file.tell()
+        index_offset, = FOOTER.unpack(self.file.read(FOOTER.size))
+        self.file.seek(index_offset)
+        index = json.loads(zlib.decompress(self.file.read(footer_offset - index_offset)).decode())
+
+        self.chunk_size: int = index['chunk_size']
+        self.num_frames: int = index['num_frames']
+        self.offsets: List[int] = index['offsets']
+        self.meta: Dict = index['meta']
+
+        self.cached_chunk = None
+        self.cached_frames: List[Any] = []
+
+    def __len__(self):
+        return self.num_frames
+
+    def __getitem__(self, frame: int):
+        if frame < 0:
+            frame += self.num_frames
+        if not 0 <= frame < self.num_frames:
+            raise IndexError("Frame %d out of range, the recording has %d frames" % (frame, self.num_frames))
+
+        chunk = frame // self.chunk_size
+        if chunk != self.cached_chunk:
+            start, end = self.offsets[chunk], self.offsets[chunk + 1]
+            self.file.seek(start)
+            self.cached_frames = json.loads(zlib.decompress(self.file.read(end - start)).decode())
+            self.cached_chunk = chunk
+        return self.cached_frames[frame % self.chunk_size]
+
+    def close(self):
+        self.file.close()
+
+
+def record(model: Model, visualization_elements: List[VisualizationElement], path: str, steps: int,
+           chunk_size: int = 64, precision: int = 4, meta: Dict = None):
+    """
+    Runs the model for the given number of steps and writes what the visualization elements
+    would have sent to the browser. The first frame is the model right after initialization,
+    as the ModularServer shows it.
+    """
+    with FrameWriter(path, chunk_size, precision, meta) as writer:
+        writer.write([element.render(model) for element in visualization_elements])
+        for _ in tqdm(range(steps)):
+            model.step()
+            writer.write([element.render(model) for element in visualization_elements])
+            if not model.running:
+                break
+    return path
+
+
+class ReplayModel(Model):
+    """
+    Stands in for FestivalModel in the ReplayServer, a step only moves through the recording.
+    """
+
+    def __init__(self, reader: FrameReader, start_frame: int = 0, stride: int = 1):
+        super().__init__()
+        self.reader = reader
+        self.stride = stride
+        self.frame_index = min(start_frame, len(reader) - 1)
+        self.frame = reader[self.frame_index]
+        self.running = self.frame_index < len(reader) - 1
+
+    def step(self):
+        self.frame_index = min(self.frame_index + self.stride, len(self.reader) - 1)
+        self.frame = self.reader[self.frame_index]
+        self.running = self.frame_index < len(self.reader) - 1
+
+
+class ReplayElement(VisualizationElement):
+    """
+    Keeps the frontend of the recorded element, but renders the stored frame instead of the model.
+    """
+
+    def __init__(self, element: VisualizationElement, index: int):
+        super().__init__()
+        self.package_includes = element.package_includes
+        self.local_includes = element.local_includes
+        self.js_code = element.js_code
+        self.index = index
+
+    def render(self, model: ReplayModel):
+        return model.frame[self.index]
+
+
+class ReplayServer(ModularServer):
+    """
+    Serves a recording through the same visualization elements it was recorded with.
+    Speed is set by the frame rate and the frames per step, seeking by the start frame (then reset).
+    """
+
+    def __init__(self, path: str, visualization_elements: List[VisualizationElement], name: str = "Festival Replay"):
+        self.reader = FrameReader(path)
+        elements = [ReplayElement(element, i) for i, element in enumerate(visualization_elements)]
+        last_frame = len(self.reader) - 1
+        super().__init__(ReplayModel,
+                         elements,
+                         name,
+                         {"reader": self.reader,
+                          "start_frame": UserSettableParameter('slider', 'Start frame', 0, 0, last_frame, 1),
+                          "stride": UserSettableParameter('slider', 'Frames per step', 1, 1, 20, 1)})
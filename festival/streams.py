@@ -0,0 +1,60 @@
+import random
+from bisect import bisect
+from itertools import accumulate, chain
+from typing import Any, Callable, Iterator, List, Sequence
+
+import numpy as np
+
+
+class RandomStreams:
+    """
+    Per-model source of the random numbers drawn during a step, reproducible from a single seed.
+
+    Scalar draws (error check, interaction noise, tastes, target choice) come from a seeded
+    random.Random: its bound C methods are as cheap as random.random(), and no python-level
+    wrapper around a numpy block was faster. numpy blocks are only used where the per-draw
+    work can be vectorized: the wander headings are generated as unit vectors, so wandering
+    no longer calls np.cos and np.sin per step, and the pareto fight outcome is a bisect on
+    cumulative weights instead of np.random.choice.
+    """
+
+    def __init__(self, seed: int = None, block_size: int = 4096):
+        self.seed = seed
+        self.block_size = block_size
+        self.py_rng = random.Random(seed)
+        self.rng = np.random.RandomState(seed)
+
+        # Uniform float in [0, 1) and uniform choice, same as random.random() and random.choice(seq)
+        self.random: Callable[[], float] = self.py_rng.random
+        self.choice: Callable[[Sequence[Any]], Any] = self.py_rng.choice
+        # Unit vector in a uniformly random direction, same as (cos(a), sin(a)) with a = 2*pi*random.random()
+        self.direction: Callable[[], List[float]] = self.stream(self.unit_vectors)
+
+    def stream(self, generate: Callable[[int], np.ndarray]) -> Callable[[], Any]:
+        """
+        Endless stream over blocks made by generate(block_size), refilled lazily
+        """
+        def blocks() -> Iterator[List[Any]]:
+            while True:
+                # tolist() gives plain python objects, which are much cheaper to use than numpy scalars
+                yield generate(self.block_size).tolist()
+
+        return chain.from_iterable(blocks()).__next__
+
+    def unit_vectors(self, n: int) -> np.ndarray:
+        angles = self.rng.random_sample(n) * 2 * np.pi
+        return np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+    def rand(self, n: int) -> List[float]:
+        """
+        n uniform floats in [0, 1), same as np.random.rand(n)
+        """
+        return [self.random() for _ in range(n)]
+
+    def weighted_index(self, weights: Sequence[float]) -> int:
+        """
+        Index drawn with probability proportional to its weight,
+        same as np.random.choice(np.arange(len(weights)), p=weights)
+        """
+        cum_weights = list(accumulate(weights))
+        return min(bisect(cum_weights, self.random() * cum_weights[-1]), len(cum_weights) - 1)
@@ -0,0 +1,30 @@
+import sys
+
+from festival.festival import FestivalModel
+from festival.knowledge import KnowledgeCache
+from festival.replay import record
+from festival.elements import canvas, chart
+
+path = sys.argv[1] if len(sys.argv) > 1 else 'festival.rec'
+steps = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+# Directory of a knowledge cache to warm-start the guests from and to save what they learned to
+cache_path = sys.argv[4] if len(sys.argv) > 4 else None
+
+params = {"num_party": 10,
+          "num_guard": 10,
+          "num_trouble": 10,
+          "num_celeb": 10,
+          "num_hippie": 10,
+          "learning": True,
+          "pareto_fight": False,
+          "pareto": False,
+          "lucia": False,
+          "seed": seed}
+
+cache = KnowledgeCache(cache_path) if cache_path is not None else None
+
+with FestivalModel(knowledge_cache=cache, **params) as model:
+    record(model, [canvas, chart], path, steps, meta=dict(params, knowledge_cache=cache_path))
+    if cache is not None:
+        cache.save(model)
@@ -0,0 +1,10 @@
+import sys
+
+from festival.replay import ReplayServer
+from festival.elements import canvas, chart
+
+path = sys.argv[1] if len(sys.argv) > 1 else 'festival.rec'
+
+server = ReplayServer(path, [canvas, chart])
+server.port = 8522
+server.launch()